@@ -1,17 +1,21 @@
-# IAServer.py - VERSIÓN FINAL CORREGIDA
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+# Agente.py - API de Billy AI (IAServer.py la reexporta)
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
+from dataclasses import dataclass, field
 import uvicorn
 import ollama
-import fitz  # PyMuPDF
+import httpx
+from cachetools import TTLCache
 import json
+from collections import deque
 import os
+import asyncio
+import hashlib
 import time
 import random
-from fake_useragent import UserAgent
 
 # Importar módulos
 try:
@@ -60,7 +64,8 @@ except ImportError:
 app = FastAPI(
     title="Billy AI - API Académica",
     description="API para asistente académico con IA",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse  # Serialización rápida con orjson
 )
 
 # Modelos Pydantic para validación
@@ -68,10 +73,12 @@ class ChatRequest(BaseModel):
     message: str
     user_id: Optional[str] = "default"
     clear_history: Optional[bool] = False
+    stream: Optional[bool] = False
 
 class SearchRequest(BaseModel):
     query: str
     max_results: Optional[int] = 5
+    summarize: Optional[bool] = False
 
 class CitationRequest(BaseModel):
     paper_index: int
@@ -86,9 +93,152 @@ app.add_middleware(
 )
 
 # Almacenamiento en memoria
-chat_histories = {}
-ultimo_resultado = []
-pdf_actual = None
+MAX_HISTORIAL = 20
+
+# Cada historial guarda su propio lock para que ambos expiren juntos
+@dataclass
+class HistorialUsuario:
+    mensajes: deque = field(default_factory=lambda: deque(maxlen=MAX_HISTORIAL))
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+chat_histories = TTLCache(maxsize=10_000, ttl=1800)
+# A partir de este tamaño, los mensajes antiguos se condensan en un resumen
+UMBRAL_RESUMEN = 12
+MENSAJES_RECIENTES = 4
+resumenes_en_curso = set()
+tareas_resumen = set()
+
+# Cliente asíncrono de Ollama (no bloquea el event loop de FastAPI).
+# Para atender varias peticiones a la vez, arranca Ollama con:
+#   OLLAMA_NUM_PARALLEL=4 OLLAMA_MAX_LOADED_MODELS=1 OLLAMA_KEEP_ALIVE=24h ollama serve
+OLLAMA_URL = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+ollama_client = None
+
+@app.on_event("startup")
+async def abrir_cliente_ollama():
+    """Crear un único pool de conexiones hacia Ollama"""
+    global ollama_client
+    ollama_client = ollama.AsyncClient(
+        host=OLLAMA_URL,
+        limits=httpx.Limits(
+            max_keepalive_connections=40,
+            max_connections=100,
+            keepalive_expiry=30.0
+        ),
+        timeout=httpx.Timeout(300.0, connect=10.0)
+    )
+
+@app.on_event("startup")
+async def precargar_modelo():
+    """Cargar el modelo al arrancar para que la primera petición no espere"""
+    try:
+        # Generar un solo token basta para cargarlo; keep_alive lo mantiene en memoria
+        await ollama_client.generate(
+            model="gemma3:1b",
+            prompt=" ",
+            options={"num_predict": 1},
+            keep_alive="24h"
+        )
+        print("✅ Modelo gemma3:1b precargado")
+    except Exception as e:
+        print(f"⚠️  No se pudo precargar el modelo: {e}")
+
+@app.on_event("shutdown")
+async def cerrar_cliente_ollama():
+    """Cerrar el pool de conexiones hacia Ollama"""
+    if ollama_client is not None:
+        await ollama_client.close()
+
+# Máximo de caracteres del PDF que se guardan para el modelo
+MAX_CTX = 8000
+
+# Análisis de PDFs ya procesados, por hash de su contenido
+pdf_cache = TTLCache(maxsize=256, ttl=86400)
+
+def contexto_pdf(pdf):
+    """Construir una vez el contexto que /ask-pdf envía al modelo"""
+    # Limitar el contexto para no saturar la memoria
+    return (
+        f"Contenido del PDF '{pdf['filename']}' ({pdf['paginas']} páginas):\n"
+        + pdf['texto'][:3000]  # Limitar a 3000 caracteres
+    )
+
+def extraer_pdf(contenido: bytes):
+    """Extraer texto, páginas y metadatos del PDF (operación bloqueante)"""
+    import fitz  # PyMuPDF, se carga solo al subir el primer PDF
+    
+    doc = fitz.open(stream=contenido, filetype="pdf")
+    try:
+        # Solo extraer el texto que realmente se enviará al modelo
+        partes = []
+        total = 0
+        for pagina in doc:
+            parte = pagina.get_text()
+            partes.append(parte)
+            total += len(parte)
+            if total >= MAX_CTX:
+                break
+        
+        return "".join(partes)[:MAX_CTX], len(doc), doc.metadata
+    finally:
+        doc.close()
+
+# Caché de respuestas del modelo: mismos mensajes => misma respuesta
+llm_cache = TTLCache(maxsize=1024, ttl=3600)
+llm_cache_lock = asyncio.Lock()
+
+async def cached_chat(messages, model="gemma3:1b", formato=None):
+    """Llamar a Ollama reutilizando respuestas ya generadas"""
+    clave = hashlib.blake2b(
+        json.dumps([model, formato, messages], sort_keys=True).encode()
+    ).hexdigest()
+    
+    async with llm_cache_lock:
+        if clave in llm_cache:
+            return llm_cache[clave]
+    
+    response = await ollama_client.chat(model=model, messages=messages, format=formato, stream=False)
+    
+    async with llm_cache_lock:
+        llm_cache[clave] = response
+    
+    return response
+
+def evento_sse(datos):
+    """Formatear un evento Server-Sent Events"""
+    return f"data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+async def stream_chat(messages, al_terminar=None):
+    """Enviar la respuesta del modelo por SSE a medida que se genera"""
+    partes = []
+    try:
+        async for chunk in await ollama_client.chat(model="gemma3:1b", messages=messages, stream=True):
+            contenido = chunk["message"]["content"]
+            partes.append(contenido)
+            yield evento_sse({"content": contenido})
+        
+        if al_terminar is not None:
+            await al_terminar("".join(partes))
+        
+        yield evento_sse({"done": True})
+    except Exception as e:
+        yield evento_sse({"error": str(e)})
+
+# Estado por sesión (últimos papers buscados y PDF cargado)
+@dataclass
+class SessionState:
+    ultimo_resultado: list = field(default_factory=list)
+    pdf_actual: Optional[dict] = None
+
+sessions = TTLCache(maxsize=10_000, ttl=1800)
+
+def get_session(session_id: str = "default") -> SessionState:
+    """Obtener el estado de la sesión y renovar su expiración"""
+    estado = sessions.get(session_id)
+    if estado is None:
+        estado = SessionState()
+    sessions[session_id] = estado
+    return estado
 
 # Instrucciones del sistema
 instrucciones = """
@@ -97,27 +247,122 @@ Eres amable, educativo y siempre intentas ayudar con precisión.
 Si no sabes algo, lo admites honestamente.
 """
 
+# Plantillas de análisis de búsqueda (se construyen una sola vez)
+ANALISIS_TMPL_REAL = """
+Se encontraron {n} papers sobre "{query}".
+
+Por favor, da un breve análisis educativo sobre estos hallazgos.
+Incluye posibles aplicaciones prácticas y áreas de investigación futura.
+""".format
+
+ANALISIS_TMPL_SIM = """
+Se encontraron {n} papers sobre "{query}".
+
+⚠️  NOTA: Se están usando datos simulados porque Google Scholar no está disponible.
+
+Por favor, da un breve análisis educativo sobre estos hallazgos.
+Incluye posibles aplicaciones prácticas y áreas de investigación futura.
+""".format
+
+RESUMENES_TMPL = """
+Resume cada uno de estos papers en una o dos frases.
+Responde solo con JSON: {{"resumenes": [{{"indice": 0, "resumen": "..."}}]}}
+
+Papers:
+{papers}
+""".format
+
+async def resumir_papers(resultados):
+    """Resumir todos los papers con una sola llamada al modelo"""
+    papers = "\n---\n".join(
+        f"[{i}] {p['titulo']}: {p['resumen']}" for i, p in enumerate(resultados)
+    )
+    
+    # Los resúmenes son opcionales: si fallan, la búsqueda sigue respondiendo
+    try:
+        response = await cached_chat(
+            messages=[
+                {"role": "system", "content": instrucciones},
+                {"role": "user", "content": RESUMENES_TMPL(papers=papers)}
+            ],
+            formato="json"
+        )
+        datos = json.loads(response["message"]["content"])
+    except Exception as e:
+        print(f"⚠️  No se pudieron resumir los papers: {e}")
+        return {}
+    
+    resumenes = {}
+    for item in datos.get("resumenes", []) if isinstance(datos, dict) else []:
+        if isinstance(item, dict) and isinstance(item.get("indice"), int):
+            resumenes[item["indice"]] = str(item.get("resumen", ""))
+    return resumenes
+
+def get_historial(user_id: str = "default") -> HistorialUsuario:
+    """Obtener el historial con su lock y renovar su expiración"""
+    historial = chat_histories.get(user_id)
+    if historial is None:
+        historial = HistorialUsuario()
+    chat_histories[user_id] = historial
+    return historial
+
 def get_user_history(user_id: str = "default"):
     """Obtener historial de usuario"""
-    if user_id not in chat_histories:
-        chat_histories[user_id] = []
-    return chat_histories[user_id]
-
-def add_to_history(user_id: str, role: str, content: str):
-    """Agregar mensaje al historial"""
-    history = get_user_history(user_id)
-    history.append({"role": role, "content": content})
-    
-    # Limitar historial
-    if len(history) > 20:
-        chat_histories[user_id] = history[-20:]
+    return get_historial(user_id).mensajes
+
+async def add_to_history(user_id: str, *mensajes: dict):
+    """Agregar mensajes al historial de forma atómica por usuario"""
+    historial = get_historial(user_id)
+    async with historial.lock:
+        history = historial.mensajes
+        # El deque descarta solo los mensajes más antiguos
+        history.extend(mensajes)
+        
+        # Resumir en segundo plano para no retrasar la respuesta
+        if len(history) >= UMBRAL_RESUMEN and user_id not in resumenes_en_curso:
+            resumenes_en_curso.add(user_id)
+            tarea = asyncio.create_task(resumir_historial(user_id))
+            tareas_resumen.add(tarea)
+            tarea.add_done_callback(tareas_resumen.discard)
     
     return history
 
-def clear_user_history(user_id: str):
+async def resumir_historial(user_id: str):
+    """Reemplazar los mensajes antiguos por un resumen y conservar los últimos"""
+    try:
+        historial = get_historial(user_id)
+        antiguos = list(historial.mensajes)[:-MENSAJES_RECIENTES]
+        conversacion = "\n".join(f"{m['role']}: {m['content']}" for m in antiguos)
+        
+        response = await cached_chat(
+            messages=[
+                {"role": "system", "content": "Resume esta conversación en 150 palabras como máximo."},
+                {"role": "user", "content": conversacion}
+            ]
+        )
+        resumen = {
+            "role": "system",
+            "content": f"Contexto previo: {response['message']['content']}"
+        }
+        
+        async with historial.lock:
+            history = historial.mensajes
+            # Solo reemplazar si el historial no se limpió ni recortó mientras tanto
+            if len(history) >= len(antiguos) and history[0] is antiguos[0]:
+                for _ in antiguos:
+                    history.popleft()
+                history.appendleft(resumen)
+    except Exception as e:
+        print(f"⚠️  No se pudo resumir el historial: {e}")
+    finally:
+        resumenes_en_curso.discard(user_id)
+
+async def clear_user_history(user_id: str):
     """Limpiar historial de usuario"""
-    if user_id in chat_histories:
-        chat_histories[user_id] = []
+    historial = chat_histories.get(user_id)
+    if historial is not None:
+        async with historial.lock:
+            historial.mensajes.clear()
     return True
 
 @app.get("/")
@@ -139,30 +384,45 @@ async def root():
         }
     }
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+# Resultado del health check reutilizado durante unos segundos
+health_cache = TTLCache(maxsize=1, ttl=10)
+
+async def check_ollama():
+    """Comprobar la conexión con Ollama sin generar texto"""
+    if "estado" in health_cache:
+        return health_cache["estado"]
+    
     try:
-        # Probar conexión con Ollama
-        test_response = ollama.chat(
-            model="gemma3:1b",
-            messages=[{"role": "user", "content": "Hola"}],
-            stream=False
-        )
+        # Consulta ligera de metadatos en lugar de una generación completa
+        await ollama_client.list()
         
-        return {
+        estado = {
             "status": "healthy",
             "ollama": "connected",
             "model": "gemma3:1b",
             "timestamp": time.time()
         }
     except Exception as e:
-        return {
+        estado = {
             "status": "degraded",
             "ollama": "disconnected",
             "error": str(e),
             "timestamp": time.time()
         }
+    
+    health_cache["estado"] = estado
+    return estado
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    estado = await check_ollama()
+    
+    # 503 para que los liveness probes detecten que Ollama no responde
+    if estado["status"] != "healthy":
+        return ORJSONResponse(status_code=503, content=estado)
+    
+    return estado
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
@@ -172,7 +432,7 @@ async def chat_endpoint(request: ChatRequest):
         
         # Limpiar historial si se solicita
         if request.clear_history:
-            clear_user_history(user_id)
+            await clear_user_history(user_id)
             return {
                 "success": True,
                 "response": "✅ Historial limpiado. ¿En qué puedo ayudarte ahora?",
@@ -183,22 +443,39 @@ async def chat_endpoint(request: ChatRequest):
         history = get_user_history(user_id)
         
         # Construir mensajes para Ollama
-        messages = [{"role": "system", "content": instrucciones}]
-        messages.extend(history)
-        messages.append({"role": "user", "content": request.message})
+        messages = (
+            [{"role": "system", "content": instrucciones}]
+            + list(history)
+            + [{"role": "user", "content": request.message}]
+        )
+        
+        # Respuesta progresiva si el cliente la pide
+        if request.stream:
+            async def guardar_respuesta(bot_response):
+                await add_to_history(
+                    user_id,
+                    {"role": "user", "content": request.message},
+                    {"role": "assistant", "content": bot_response}
+                )
+            
+            return StreamingResponse(
+                stream_chat(messages, guardar_respuesta),
+                media_type="text/event-stream"
+            )
         
         # Obtener respuesta
-        response = ollama.chat(
-            model="gemma3:1b",
-            messages=messages,
-            stream=False
+        response = await cached_chat(
+            messages=messages
         )
         
         bot_response = response["message"]["content"]
         
         # Guardar en historial
-        add_to_history(user_id, "user", request.message)
-        add_to_history(user_id, "assistant", bot_response)
+        await add_to_history(
+            user_id,
+            {"role": "user", "content": request.message},
+            {"role": "assistant", "content": bot_response}
+        )
         
         return {
             "success": True,
@@ -214,15 +491,15 @@ async def chat_endpoint(request: ChatRequest):
         }
 
 @app.post("/search")
-async def search_papers(request: SearchRequest):
+async def search_papers(request: SearchRequest, session_id: str = Header("default", alias="X-Session-ID")):
     """Buscar papers académicos con fallback a simulados"""
     try:
-        global ultimo_resultado
-        
         print(f"🔍 Buscando: '{request.query}' (max: {request.max_results})")
         
         # Intentar búsqueda real
-        resultados = buscar_papers(request.query, max_resultados=request.max_results)
+        resultados = await asyncio.to_thread(
+            buscar_papers, request.query, max_resultados=request.max_results
+        )
         
         usar_simulados = False
         
@@ -230,32 +507,30 @@ async def search_papers(request: SearchRequest):
         if not resultados:
             print("⚠️  No hay resultados, usando datos simulados")
             usar_simulados = True
-            # Importar aquí para evitar circular imports
-            from Buscar_papers import generar_simulados
             resultados = generar_simulados(request.query, request.max_results)
         
         # Guardar para futuras citas
-        ultimo_resultado = resultados
+        get_session(session_id).ultimo_resultado = resultados
         
         # Generar análisis
-        analisis_prompt = f"""
-        Se encontraron {len(resultados)} papers sobre "{request.query}".
-        
-        {'⚠️  NOTA: Se están usando datos simulados porque Google Scholar no está disponible.' if usar_simulados else ''}
+        plantilla = ANALISIS_TMPL_SIM if usar_simulados else ANALISIS_TMPL_REAL
+        analisis_prompt = plantilla(n=len(resultados), query=request.query)
         
-        Por favor, da un breve análisis educativo sobre estos hallazgos.
-        Incluye posibles aplicaciones prácticas y áreas de investigación futura.
-        """
-        
-        response = ollama.chat(
-            model="gemma3:1b",
+        analisis = cached_chat(
             messages=[
                 {"role": "system", "content": instrucciones},
                 {"role": "user", "content": analisis_prompt}
-            ],
-            stream=False
+            ]
         )
         
+        # Resúmenes por paper en una sola llamada, en paralelo con el análisis
+        if request.summarize:
+            response, resumenes = await asyncio.gather(analisis, resumir_papers(resultados))
+            for i, paper in enumerate(resultados):
+                paper["resumen_ia"] = resumenes.get(i)
+        else:
+            response = await analisis
+        
         analysis_text = response["message"]["content"]
         
         return {
@@ -279,10 +554,8 @@ async def search_papers(request: SearchRequest):
         }
 
 @app.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...), session_id: str = Header("default", alias="X-Session-ID")):
     """Subir y analizar PDF"""
-    global pdf_actual
-    
     try:
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Solo se aceptan archivos PDF")
@@ -290,70 +563,61 @@ async def upload_pdf(file: UploadFile = File(...)):
         # Leer contenido del PDF
         contenido = await file.read()
         
-        # Guardar temporalmente
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(contenido)
-        
-        # Analizar PDF
-        try:
-            doc = fitz.open(temp_path)
-            
-            texto = ""
-            for pagina in doc:
-                texto += pagina.get_text()
+        # PDFs idénticos reutilizan la extracción y el análisis anteriores
+        digest = hashlib.blake2b(contenido, digest_size=16).hexdigest()
+        
+        if digest in pdf_cache:
+            pdf_guardado, respuesta = pdf_cache[digest]
+            pdf_actual = {**pdf_guardado, "filename": file.filename}
+            pdf_actual["qa_context"] = contexto_pdf(pdf_actual)
+            get_session(session_id).pdf_actual = pdf_actual
+        else:
+            # Extraer el texto en un hilo para no bloquear el event loop
+            texto, paginas, metadata = await asyncio.to_thread(extraer_pdf, contenido)
             
             pdf_actual = {
                 "texto": texto,
-                "paginas": len(doc),
-                "metadata": doc.metadata,
+                "paginas": paginas,
+                "metadata": metadata,
                 "filename": file.filename,
                 "size": len(contenido)
             }
-            
-            doc.close()
-            
-            # Eliminar archivo temporal
-            os.remove(temp_path)
+            pdf_actual["qa_context"] = contexto_pdf(pdf_actual)
+            get_session(session_id).pdf_actual = pdf_actual
             
             # Crear análisis
-            from Lector_PDF import crear_analisis
             prompt_analisis = crear_analisis(pdf_actual)
             
             # Analizar con IA
-            analisis = ollama.chat(
-                model="gemma3:1b",
+            analisis = await cached_chat(
                 messages=[
                     {"role": "system", "content": instrucciones},
                     {"role": "user", "content": prompt_analisis}
-                ],
-                stream=False
+                ]
             )
             
             respuesta = analisis["message"]["content"]
             
-            return {
-                "success": True,
-                "filename": file.filename,
-                "pages": pdf_actual["paginas"],
-                "analysis": respuesta,
-                "preview": texto[:300] + "..." if len(texto) > 300 else texto,
-                "size_kb": len(contenido) // 1024
-            }
-            
-        except Exception as e:
-            # Limpiar en caso de error
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
-            
+            pdf_cache[digest] = (pdf_actual, respuesta)
+        
+        texto = pdf_actual["texto"]
+        
+        return {
+            "success": True,
+            "filename": file.filename,
+            "pages": pdf_actual["paginas"],
+            "analysis": respuesta,
+            "preview": texto[:300] + "..." if len(texto) > 300 else texto,
+            "size_kb": len(contenido) // 1024
+        }
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al procesar PDF: {str(e)}")
 
 @app.post("/citation")
-async def generate_citation(request: CitationRequest):
+async def generate_citation(request: CitationRequest, session_id: str = Header("default", alias="X-Session-ID")):
     """Generar cita APA para un paper"""
-    global ultimo_resultado
+    ultimo_resultado = get_session(session_id).ultimo_resultado
     
     try:
         if not ultimo_resultado:
@@ -392,7 +656,7 @@ async def generate_citation(request: CitationRequest):
 async def clear_history(user_id: str = Form("default")):
     """Limpiar historial de chat"""
     try:
-        clear_user_history(user_id)
+        await clear_user_history(user_id)
         return {
             "success": True, 
             "message": f"✅ Historial de usuario '{user_id}' limpiado"
@@ -404,9 +668,13 @@ async def clear_history(user_id: str = Form("default")):
         }
 
 @app.post("/ask-pdf")
-async def ask_about_pdf(question: str = Form(...)):
+async def ask_about_pdf(
+    question: str = Form(...),
+    stream: bool = Form(False),
+    session_id: str = Header("default", alias="X-Session-ID")
+):
     """Hacer preguntas sobre el PDF cargado"""
-    global pdf_actual
+    pdf_actual = get_session(session_id).pdf_actual
     
     try:
         if not pdf_actual:
@@ -416,19 +684,16 @@ async def ask_about_pdf(question: str = Form(...)):
                 "response": None
             }
         
-        # Limitar el contexto para no saturar la memoria
-        contexto = f"Contenido del PDF '{pdf_actual['filename']}' ({pdf_actual['paginas']} páginas):\n"
-        contexto += pdf_actual['texto'][:3000]  # Limitar a 3000 caracteres
+        messages = [
+            {"role": "system", "content": instrucciones},
+            {"role": "user", "content": pdf_actual["qa_context"]},
+            {"role": "user", "content": f"Pregunta sobre el PDF: {question}"}
+        ]
         
-        response = ollama.chat(
-            model="gemma3:1b",
-            messages=[
-                {"role": "system", "content": instrucciones},
-                {"role": "user", "content": contexto},
-                {"role": "user", "content": f"Pregunta sobre el PDF: {question}"}
-            ],
-            stream=False
-        )
+        if stream:
+            return StreamingResponse(stream_chat(messages), media_type="text/event-stream")
+        
+        response = await cached_chat(messages=messages)
         
         return {
             "success": True,
@@ -446,9 +711,9 @@ async def ask_about_pdf(question: str = Form(...)):
 
 # Endpoint para obtener bibliografía
 @app.get("/bibliography")
-async def get_bibliography():
+async def get_bibliography(session_id: str = Header("default", alias="X-Session-ID")):
     """Obtener bibliografía completa de los últimos papers buscados"""
-    global ultimo_resultado
+    ultimo_resultado = get_session(session_id).ultimo_resultado
     
     try:
         if not ultimo_resultado:
@@ -1,4 +1,5 @@
 from scholarly import scholarly
+import random
 import time
 
 def buscar_papers(consulta, max_resultados=5):
@@ -46,6 +47,33 @@ def buscar_papers(consulta, max_resultados=5):
         return []
 
 
+def generar_simulados(consulta, max_resultados=5):
+    """
+    Genera papers simulados cuando Google Scholar no devuelve resultados.
+    Args:
+        consulta (str): Término de búsqueda
+        max_resultados (int): Número de papers a generar
+    Returns:
+        list: Lista de diccionarios con el mismo formato que buscar_papers
+    """
+    papers = []
+    temas = ["machine learning", "deep learning", "inteligencia artificial", "redes neuronales"]
+
+    for i in range(max_resultados):
+        paper = {
+            'titulo': f"{consulta.capitalize()} en {random.choice(temas)}: Un estudio experimental",
+            'autores': [f"Autor {i+1}", f"Investigador {i+2}"],
+            'año': str(random.randint(2018, 2024)),
+            'revista': f"Journal of {consulta.capitalize()} Research",
+            'resumen': f"Este artículo explora las aplicaciones de {consulta} en contextos académicos...",
+            'citacion': random.randint(5, 150),
+            'url': f"https://example.com/paper/{i+1}",
+        }
+        papers.append(paper)
+
+    return papers
+
+
 def formato_resultados(paper, numero):
     """
     Devuelve un texto formateado para mostrar un paper bonito.
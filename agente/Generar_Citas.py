@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 def generar_cita_apa(paper):
     """
     Generar una cita en formato APA 7 
@@ -16,26 +18,34 @@ def generar_cita_apa(paper):
     str:Cita formateada en APA 7 
     """
 
-    if isinstance(paper['autores'],list):
-        if len(paper['autores'])==1:
-            autores_formato=paper['autores'][0]
-        elif len (paper['autores'])==2:
-            autores_formato=f"{paper['autores'][0]} & {paper['autores'][1]}"
-        elif len(paper['autores'])<=20:
-            autores_formato=','.join(paper['autores'][:-1])+f",& {paper['autores'][-1]}"
+    autores=paper['autores']
+    if isinstance(autores,list):
+        autores=tuple(autores)
+    return formatear_cita_apa(autores,paper.get('año','s.f.'),paper['titulo'],
+                              paper.get('revista',''),paper.get('url',''))
+
+@lru_cache(maxsize=1024)
+def formatear_cita_apa(autores,año,titulo,revista,url):
+    """
+    Formatea la cita APA 7 a partir de campos inmutables.
+    Se cachea para que citar el mismo paper varias veces no repita el trabajo.
+    """
+    if isinstance(autores,tuple):
+        if len(autores)==1:
+            autores_formato=autores[0]
+        elif len (autores)==2:
+            autores_formato=f"{autores[0]} & {autores[1]}"
+        elif len(autores)<=20:
+            autores_formato=','.join(autores[:-1])+f",& {autores[-1]}"
         else:
-            autores_formato=','.join(paper['autores'][:19])+",..."+{paper['autores'][1]}
+            autores_formato=','.join(autores[:19])+",..."+{autores[1]}
     else:
-        autores_formato=paper['autores']
-    año=paper.get('año','s.f.')
+        autores_formato=autores
     if año=='Sin Año':
         año='s.f.'
-    titulo=paper['titulo']
-    revista=paper.get('revista','')
     cita=f"{autores_formato}({año}).{titulo}"
     if  revista and revista !='Sin Nombre':
         cita+=f"{revista}"
-    url=paper.get('url','')
     if url and url!='Sin URL':
         cita+=f"{url}"
     return cita 
@@ -55,7 +65,7 @@ def generar_bibliografia_apa(lista_papers):
     for paper in lista_papers:
         cita=generar_cita_apa(paper)
         bibliografia+=f"{cita}\n\n"
-    bibliografia="-"*60+"\n"
+    bibliografia+="-"*60+"\n"
     return bibliografia
 
 def mostrar_cita_paper(paper,numero,formato='apa'):
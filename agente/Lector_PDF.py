@@ -1,5 +1,3 @@
-import fitz  # PyMuPDF
-
 def leer_pdf(ruta):
     """
     Lee un archivo PDF y devuelve su texto, paginación y metadatos.
@@ -10,6 +8,8 @@ def leer_pdf(ruta):
     Returns:
         dict: Información del PDF.
     """
+    import fitz  # PyMuPDF, se carga solo cuando se lee un PDF
+
     try:
         doc = fitz.open(ruta)
         texto = ""